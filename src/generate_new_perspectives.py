@@ -1,14 +1,101 @@
-import json
 import uuid
 import time
 from pathlib import Path
 
+import orjson
+
+# Invariant parts of the perspective, built once at import time.
+# Only immutable values live in these templates (the palette colors are a
+# tuple); list fields are created fresh per object so perspectives never share
+# mutable state.
+_PALETTE = {
+    "colors": (
+        "#FFE081", "#C990C0", "#F79767", "#57C7E3", "#F16667", "#D9C8AE",
+        "#8DCC93", "#ECB5C9", "#4C8EDA", "#FFC454", "#DA7194", "#569480",
+        "#959AA1", "#D9D9D9"
+    ),
+    "currentIndex": 0
+}
+
+_CATEGORY_TEMPLATE = {
+    "icon": "no-icon",  # You might want to map this to actual Bloom icon UUIDs if known
+    "size": 1,
+    "textSize": 1,
+    "textAlign": "top"
+}
+
+_REL_TEMPLATE = {
+    "size": 1,  # CRITICAL FIELD
+    "textSize": 1,
+    "textAlign": "top"
+}
+
+
+def _write_json(path, obj, indent=False):
+    """Serializes obj with orjson and writes it to path in a single call."""
+    opt = orjson.OPT_INDENT_2 if indent else 0
+    Path(path).write_bytes(orjson.dumps(obj, option=opt))
+
+
+def _make_rel_obj(rel_type, color):
+    """Builds a relationshipType entry with a default relationship caption."""
+    return {
+        "id": rel_type,
+        "name": rel_type,
+        "color": color,
+        "properties": [],
+        **_REL_TEMPLATE,
+        "captions": [{
+            "key": rel_type,
+            "type": "relationship",
+            "isCaption": True,
+            "inTooltip": True,
+            "styles": []
+        }],
+        "captionKeys": [],
+        "styleRules": []
+    }
+
+
+def _build_category(i, cat_conf, properties, timestamp):
+    """
+    Builds the category object for one categories_config entry (ids are 1-based).
+    properties is the entry's list of {"name": "prop", "dataType": "string"}.
+    """
+    label = cat_conf["label"]
+
+    # Add a default caption if properties exist
+    captions = []
+    if properties:
+        captions.append({
+            "key": properties[0]["name"],
+            "type": "property",
+            "isCaption": True,
+            "inTooltip": True,
+            "styles": [],
+            "isGdsData": False
+        })
+
+    return {
+        "id": i + 1,
+        "name": cat_conf.get("name", label),
+        "labels": [label],
+        "properties": [{"name": p["name"], "exclude": False, "dataType": p["dataType"]} for p in properties],
+        "createdAt": timestamp,
+        "lastEditedAt": timestamp,
+        "color": cat_conf.get("color", "#CCCCCC"),
+        **_CATEGORY_TEMPLATE,
+        "captions": captions,
+        "captionKeys": [],
+        "styleRules": []
+    }
+
 
 def generate_bloom_perspective(name, categories_config, relationships_config, output_file, all_known_relationships=None, all_known_labels=None):
     timestamp = int(time.time() * 1000)
 
-    # Calculate hidden relationships
-    used_rels = [r["type"] for r in relationships_config]
+    # Calculate hidden relationships (set lookup, but keep the caller's order)
+    used_rels = {r["type"] for r in relationships_config}
     hidden_rels = []
     if all_known_relationships:
         hidden_rels = [
@@ -31,14 +118,7 @@ def generate_bloom_perspective(name, categories_config, relationships_config, ou
         "templates": [],
         "sceneActions": [],
         "hiddenRelationshipTypes": hidden_rels,
-        "palette": {
-            "colors": [
-                "#FFE081", "#C990C0", "#F79767", "#57C7E3", "#F16667", "#D9C8AE",
-                "#8DCC93", "#ECB5C9", "#4C8EDA", "#FFC454", "#DA7194", "#569480",
-                "#959AA1", "#D9D9D9"
-            ],
-            "currentIndex": 0
-        },
+        "palette": _PALETTE.copy(),
         "metadata": {
             "pathSegments": [],
             "indexes": []
@@ -52,107 +132,39 @@ def generate_bloom_perspective(name, categories_config, relationships_config, ou
                 {"propertyKey": p["name"], "type": label, "dataType": p["dataType"]} for p in props
             ]
 
-    # Process Categories
+    # Process Categories, in one pass that also fills the labels dict and the
+    # metadata indexes for each category
+    categories = perspective["categories"]
+    labels = perspective["labels"]
+    indexes = perspective["metadata"]["indexes"]
     for i, cat_conf in enumerate(categories_config):
         label = cat_conf["label"]
-        cat_name = cat_conf.get("name", label)
-        color = cat_conf.get("color", "#CCCCCC")
-        # List of {"name": "prop", "dataType": "string"}
         properties = cat_conf.get("properties", [])
 
-        # Category Object
-        category = {
-            "id": i + 1,
-            "name": cat_name,
-            "labels": [label],
-            "properties": [{"name": p["name"], "exclude": False, "dataType": p["dataType"]} for p in properties],
-            "createdAt": timestamp,
-            "lastEditedAt": timestamp,
-            "color": color,
-            "icon": "no-icon",  # You might want to map this to actual Bloom icon UUIDs if known
-            "size": 1,
-            "textSize": 1,
-            "textAlign": "top",
-            "captions": [],
-            "captionKeys": [],
-            "styleRules": []
-        }
-
-        # Add a default caption if properties exist
-        if properties:
-            category["captions"].append({
-                "key": properties[0]["name"],
-                "type": "property",
-                "isCaption": True,
-                "inTooltip": True,
-                "styles": [],
-                "isGdsData": False
-            })
-
-        perspective["categories"].append(category)
+        categories.append(_build_category(i, cat_conf, properties, timestamp))
 
-        # Ensure label is in labels dict (if not already added via all_known_labels)
-        if label not in perspective["labels"]:
-            perspective["labels"][label] = [
-                {"propertyKey": p["name"], "type": label, "dataType": p["dataType"]} for p in properties
+        # Ensure each label is in labels dict (if not already added via all_known_labels)
+        if label not in labels:
+            labels[label] = [
+                {"propertyKey": p["name"], "type": label, "dataType": p["dataType"]}
+                for p in properties
             ]
 
         # Metadata Indexes
-        perspective["metadata"]["indexes"].append({
+        indexes.append({
             "label": label,
             "type": "native",
             "propertyKeys": [{"key": p["name"], "metadataProp": False} for p in properties]
         })
 
-    # Process Relationships
-    for i, rel_conf in enumerate(relationships_config):
-        rel_type = rel_conf["type"]
-
-        rel_obj = {
-            "id": rel_type,
-            "name": rel_type,
-            "color": "#A5ABB6",
-            "properties": [],
-            "size": 1,  # CRITICAL FIELD
-            "textSize": 1,
-            "textAlign": "top",
-            "captions": [{
-                "key": rel_type,
-                "type": "relationship",
-                "isCaption": True,
-                "inTooltip": True,
-                "styles": []
-            }],
-            "captionKeys": [],
-            "styleRules": []
-        }
-        perspective["relationshipTypes"].append(rel_obj)
-
-    # Add hidden relationships to relationshipTypes as well, but marked as hidden in root
-    for hidden_rel in hidden_rels:
-        rel_obj = {
-            "id": hidden_rel,
-            "name": hidden_rel,
-            "color": "#959AA1",
-            "properties": [],
-            "size": 1,
-            "textSize": 1,
-            "textAlign": "top",
-            "captions": [{
-                "key": hidden_rel,
-                "type": "relationship",
-                "isCaption": True,
-                "inTooltip": True,
-                "styles": []
-            }],
-            "captionKeys": [],
-            "styleRules": []
-        }
-        perspective["relationshipTypes"].append(rel_obj)
+    # Process Relationships, then hidden relationships (also listed in relationshipTypes,
+    # but marked as hidden in root)
+    perspective["relationshipTypes"] = [
+        _make_rel_obj(r["type"], "#A5ABB6") for r in relationships_config
+    ] + [_make_rel_obj(h, "#959AA1") for h in hidden_rels]
 
     # Write to file
-    with open(output_file, 'w') as f:
-        json.dump(perspective, f, indent=2)
+    _write_json(output_file, perspective, indent=True)
     print(f"Created perspective: {output_file}")
 
 
@@ -1,8 +1,15 @@
 import os
+import re
+import string
 import json
+import argparse
+import functools
+import itertools
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import orjson
 from dotenv import load_dotenv
 from openai import OpenAI
 
@@ -13,6 +20,51 @@ from prompts import BLOOM_PERSPECTIVE_SYSTEM_PROMPT, USER_PROMPT_TEMPLATE
 # Load environment variables
 load_dotenv()
 
+# Leading ```json / ``` and trailing ``` fences around the LLM response
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+# Deletes every ASCII character that isn't allowed in output filenames
+_ALLOWED = frozenset(string.ascii_letters + string.digits + " -_")
+_SAFE_TRANS = str.maketrans(
+    {c: None for c in map(chr, range(128)) if c not in _ALLOWED})
+
+# Marker left on hydrated dicts so repeat hydrate_perspective calls are no-ops.
+# Kept in memory only (see _without_marker). Bump the suffix whenever the
+# hydration steps change.
+_HYDRATED_KEY = "_hydrated_version"
+_HYDRATED_VERSION = "2.21.0-r1"
+
+# Fixed category fields applied during hydration
+_CAT_DEFAULTS = {
+    "size": 1,
+    "icon": "no-icon",  # Use "no-icon" - this works fine
+    # Missing fields identified by comparison
+    "textSize": 1,
+    "textAlign": "top"
+}
+
+
+def _write_json(path, obj, indent=False):
+    """Serializes obj with orjson and writes it to path in a single call."""
+    opt = orjson.OPT_INDENT_2 if indent else 0
+    Path(path).write_bytes(orjson.dumps(obj, option=opt))
+
+
+def _without_marker(perspective):
+    """Returns a shallow copy of perspective without the hydration marker, for output."""
+    return {k: v for k, v in perspective.items() if k != _HYDRATED_KEY}
+
+
+def _safe_filename(name):
+    """Keeps alphanumerics, spaces, '-' and '_', then turns spaces into underscores."""
+    if name.isascii():
+        # One C-level pass instead of a per-character Python filter
+        safe_name = name.translate(_SAFE_TRANS)
+    else:
+        safe_name = "".join(
+            [c for c in name if c.isalnum() or c in (' ', '-', '_')])
+    return safe_name.strip().replace(" ", "_")
+
 
 def get_llm_client():
     """Configures and returns the OpenAI client for Gemini."""
@@ -28,44 +80,53 @@ def get_llm_client():
     )
 
 
+@functools.lru_cache(maxsize=1)
 def load_example_perspective():
-    """Loads the Customer Purchase Journey.json as a few-shot example."""
+    """Loads the Customer Purchase Journey.json as a few-shot example (read once per process)."""
     # Go up one level from src to bloom_automation, then into example
     example_path = Path(__file__).parent.parent / \
         "example" / "Customer Purchase Journey.json"
     try:
-        with open(example_path, "r", encoding="utf-8") as f:
-            return f.read()
+        return example_path.read_text(encoding="utf-8")
     except Exception as e:
         print(f"⚠️ Warning: Could not load example file: {e}")
         return ""
 
 
+@functools.lru_cache(maxsize=None)
+def _strip_backticks(label):
+    """Memoized backtick removal; the same labels recur across every perspective."""
+    return label.replace("`", "")
+
+
 def clean_label(label):
     """Removes backticks from label names. Handles lists by taking the first element."""
+    # Fast path: plain strings, usually without any backtick
+    if label.__class__ is str:
+        return _strip_backticks(label) if "`" in label else label
     if isinstance(label, list):
-        if not label:
-            return ""
-        return clean_label(label[0])
-    return str(label).replace("`", "")
+        return clean_label(label[0]) if label else ""
+    return _strip_backticks(str(label))
 
 
 def generate_metadata(schema):
-    """Generates the required metadata section (pathSegments, indexes) from the schema."""
+    """
+    Generates the required metadata section (pathSegments, indexes) from the schema.
+    Expects a schema whose labels and relationship endpoints are already cleaned.
+    """
     path_segments = []
     indexes = []
 
     # Generate Path Segments from relationships
     for rel in schema["relationships"]:
         path_segments.append({
-            "source": clean_label(rel["start"]),
-            "relationshipType": clean_label(rel["type"]),
-            "target": clean_label(rel["end"])
+            "source": rel["start"],
+            "relationshipType": rel["type"],
+            "target": rel["end"]
         })
 
     # Generate Indexes from labels and properties
     for label, props in schema["labels"].items():
-        clean_lbl = clean_label(label)
         prop_keys = []
         for p in props:
             prop_keys.append({
@@ -74,7 +135,7 @@ def generate_metadata(schema):
             })
 
         indexes.append({
-            "label": clean_lbl,
+            "label": label,
             "type": "native",
             "propertyKeys": prop_keys
         })
@@ -85,12 +146,29 @@ def generate_metadata(schema):
     }
 
 
-def hydrate_perspective(raw_perspective, schema, all_db_rels):
+def hydrate_perspective(raw_perspective, schema, all_db_rels, timestamp=None,
+                        template_ids=None):
     """
     Fills in missing default fields and fixes structure to match Bloom requirements.
     Applies the "Lock Down" logic by hiding unused relationships.
+    Pass timestamp to share one batch timestamp (in ms) across several perspectives,
+    and a shared template_ids counter (itertools.count()) so that template ids
+    generated from that timestamp stay unique across the batch.
+    Already hydrated dicts are returned unchanged; clear their marker to force a rerun.
     """
-    timestamp = int(time.time() * 1000)
+    if raw_perspective.get(_HYDRATED_KEY) == _HYDRATED_VERSION:
+        return raw_perspective
+
+    if timestamp is None:
+        timestamp = int(time.time() * 1000)
+    if template_ids is None:
+        template_ids = itertools.count()
+
+    # Bind the lists walked below once; setdefault also guarantees they exist
+    categories = raw_perspective.setdefault("categories", [])
+    rel_types = raw_perspective.setdefault("relationshipTypes", [])
+    templates = raw_perspective.setdefault("templates", [])
+    _clean = clean_label  # local name for the loops below
 
     # 1. Top Level Fields
     if "id" not in raw_perspective:
@@ -108,12 +186,10 @@ def hydrate_perspective(raw_perspective, schema, all_db_rels):
 
     # Calculate Hidden Relationships
     # 1. Identify relationships used in this perspective
-    used_rels = set()
-    for r in raw_perspective.get("relationshipTypes", []):
-        if isinstance(r, dict):
-            used_rels.add(clean_label(r.get("name", "")))
-        else:
-            used_rels.add(clean_label(r))
+    used_rels = {
+        _clean(r.get("name", "")) if isinstance(r, dict) else _clean(r)
+        for r in rel_types
+    }
 
     # 2. Subtract used from ALL known DB relationships
     hidden_rels = list(all_db_rels - used_rels)
@@ -136,41 +212,33 @@ def hydrate_perspective(raw_perspective, schema, all_db_rels):
 
     # 4. Categories
     # Bloom likes integer IDs for categories
-    for idx, cat in enumerate(raw_perspective.get("categories", [])):
-        cat["id"] = idx + 1  # 1-based index
-        cat["createdAt"] = timestamp
-        cat["lastEditedAt"] = timestamp
-        cat["size"] = 1
-        cat["icon"] = "no-icon"  # Use "no-icon" - this works fine
-        cat["styleRules"] = []
-
-        # Missing fields identified by comparison
-        cat["textSize"] = 1
-        cat["textAlign"] = "top"
-        cat["captionKeys"] = []
+    for idx, cat in enumerate(categories):
+        # Fixed fields in one update; list fields are fresh per category
+        cat.update(_CAT_DEFAULTS, id=idx + 1, createdAt=timestamp,
+                   lastEditedAt=timestamp, styleRules=[], captionKeys=[])
 
         # Clean labels
-        if "labels" in cat:
-            cat["labels"] = [clean_label(l) for l in cat["labels"]]
+        labels = cat.get("labels")
+        if labels is not None:
+            labels = cat["labels"] = [_clean(l) for l in labels]
 
         # Ensure properties structure
-        if "properties" in cat:
-            new_props = []
-            for p in cat["properties"]:
-                if isinstance(p, str):
-                    new_props.append(
-                        {"name": p, "exclude": False, "dataType": "string"})
-                else:
-                    new_props.append(p)
-            cat["properties"] = new_props
+        properties = cat.get("properties")
+        if properties is not None:
+            properties = cat["properties"] = [
+                {"name": p, "exclude": False, "dataType": "string"}
+                if isinstance(p, str) else p
+                for p in properties
+            ]
 
         # Captions
-        if "captions" not in cat or not cat["captions"]:
-            key = cat["properties"][0]["name"] if cat.get("properties") else (
-                cat["labels"][0] if cat.get("labels") else "id")
+        captions = cat.get("captions")
+        if not captions:
+            key = properties[0]["name"] if properties else (
+                labels[0] if labels else "id")
             cat["captions"] = [{
                 "key": key,
-                "type": "property" if cat.get("properties") else "label",
+                "type": "property" if properties else "label",
                 "isCaption": True,
                 "inTooltip": True,
                 "styles": [],
@@ -178,16 +246,15 @@ def hydrate_perspective(raw_perspective, schema, all_db_rels):
             }]
         else:
             # Ensure styles and isGdsData exist
-            for cap in cat["captions"]:
+            for cap in captions:
                 if "styles" not in cap:
                     cap["styles"] = []
                 if "isGdsData" not in cap and cap.get("type") == "property":
                     cap["isGdsData"] = False
 
     # 5. Relationship Types
-    for rel in raw_perspective.get("relationshipTypes", []):
-        rel["id"] = clean_label(rel["name"])
-        rel["name"] = clean_label(rel["name"])
+    for rel in rel_types:
+        rel["id"] = rel["name"] = _clean(rel["name"])
         if "properties" not in rel:
             rel["properties"] = []
         if "styleRules" not in rel:
@@ -210,9 +277,10 @@ def hydrate_perspective(raw_perspective, schema, all_db_rels):
             }]
 
     # 6. Templates (Search Phrases)
-    for tmpl in raw_perspective.get("templates", []):
+    # Offset missing template ids from the timestamp with the batch counter
+    for tmpl in templates:
         if "id" not in tmpl:
-            tmpl["id"] = f"tmpl:{timestamp + uuid.uuid4().int % 100000}"
+            tmpl["id"] = f"tmpl:{timestamp + next(template_ids)}"
         if "createdAt" not in tmpl:
             tmpl["createdAt"] = timestamp
 
@@ -238,7 +306,7 @@ def hydrate_perspective(raw_perspective, schema, all_db_rels):
                 if "suggestionBoolean" not in p:
                     p["suggestionBoolean"] = False
                 if "suggestionLabel" in p:
-                    p["suggestionLabel"] = clean_label(p["suggestionLabel"])
+                    p["suggestionLabel"] = _clean(p["suggestionLabel"])
                 if "cypher" not in p:
                     p["cypher"] = None
 
@@ -247,7 +315,7 @@ def hydrate_perspective(raw_perspective, schema, all_db_rels):
     if "labels" in raw_perspective:
         new_labels = {}
         for k, v in raw_perspective["labels"].items():
-            clean_k = clean_label(k)
+            clean_k = _clean(k)
             new_labels[clean_k] = v
             for prop in v:
                 prop["type"] = clean_k  # Ensure type matches key
@@ -261,10 +329,29 @@ def hydrate_perspective(raw_perspective, schema, all_db_rels):
     if "hideUncategorisedData" not in raw_perspective:
         raw_perspective["hideUncategorisedData"] = False
 
+    raw_perspective[_HYDRATED_KEY] = _HYDRATED_VERSION
     return raw_perspective
 
 
-def main():
+def _process_one(p_data, schema, all_db_rels, output_dir, timestamp, template_ids):
+    """Hydrates one perspective. Returns its output path and the hydrated dict."""
+    final_perspective = hydrate_perspective(
+        p_data, schema, all_db_rels, timestamp=timestamp, template_ids=template_ids)
+
+    # Generate filename from perspective name
+    safe_name = _safe_filename(final_perspective["name"])
+    return output_dir / f"{safe_name}.json", final_perspective
+
+
+def _encode_one(p_data, schema, all_db_rels, timestamp, template_ids):
+    """Hydrates one perspective and returns it as minified JSON bytes."""
+    final_perspective = hydrate_perspective(
+        p_data, schema, all_db_rels, timestamp=timestamp, template_ids=template_ids)
+    return orjson.dumps(_without_marker(final_perspective))
+
+
+def main(bundle=False):
+    """Runs the full pipeline. With bundle=True, writes one NDJSON file instead of one file per perspective."""
     print("🚀 Starting Bloom Perspective Generator...")
 
     # 1. Fetch Schema
@@ -310,12 +397,7 @@ def main():
         content = response.choices[0].message.content
 
         # Clean up potential markdown code blocks
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.endswith("```"):
-            content = content[:-3]
-
-        content = content.strip()
+        content = _FENCE_RE.sub("", content).strip()
 
         # Parse JSON
         perspectives_data = json.loads(content)
@@ -335,30 +417,66 @@ def main():
     # 4. Hydrate and Save
     print(f"✨ Processing {len(perspectives_data)} perspectives...")
 
+    # Clean labels and relationship names once, instead of per perspective
+    clean_schema = {
+        "labels": {clean_label(k): v for k, v in schema["labels"].items()},
+        "relationships": [
+            {
+                "start": clean_label(r["start"]),
+                "type": clean_label(r["type"]),
+                "end": clean_label(r["end"])
+            }
+            for r in schema["relationships"]
+        ]
+    }
+
     # Extract ALL DB relationships from schema for the "Lock Down" logic
-    all_db_rels = set(r["type"] for r in schema["relationships"])
+    all_db_rels = frozenset(r["type"] for r in clean_schema["relationships"])
 
     output_dir = Path(__file__).parent.parent / "output"
     output_dir.mkdir(exist_ok=True)
 
-    for i, p_data in enumerate(perspectives_data):
-        # Pass schema AND all_db_rels to hydrate function
-        final_perspective = hydrate_perspective(p_data, schema, all_db_rels)
-
-        # Generate filename from perspective name
-        safe_name = "".join([c for c in final_perspective["name"]
-                            if c.isalnum() or c in (' ', '-', '_')]).strip()
-        safe_name = safe_name.replace(" ", "_")
-        output_path = output_dir / f"{safe_name}.json"
-
-        with open(output_path, "w", encoding="utf-8") as f:
-            # Minify JSON to match Bloom's preferred format
-            json.dump(final_perspective, f, separators=(',', ':'))
+    # One timestamp for the whole batch, and one counter offsetting the
+    # template ids generated from it
+    batch_timestamp = int(time.time() * 1000)
+    template_ids = itertools.count()
+
+    if bundle:
+        # Single file, one minified perspective per line
+        output_path = output_dir / "bundle.ndjson"
+        with open(output_path, "wb") as f:
+            for p_data in perspectives_data:
+                f.write(_encode_one(
+                    p_data, clean_schema, all_db_rels, batch_timestamp,
+                    template_ids) + b"\n")
+
+        print(f"✅ Saved {len(perspectives_data)} perspectives: {output_path}")
+        return
 
+    # Hydration is pure Python, so it runs serially. Keyed by output path, so
+    # perspectives whose names map to the same file keep the last one and no
+    # file is written twice.
+    outputs = dict(
+        _process_one(p_data, clean_schema, all_db_rels, output_dir,
+                     batch_timestamp, template_ids)
+        for p_data in perspectives_data)
+
+    # Write the files concurrently: orjson holds the GIL while encoding, but the
+    # file writes release it. Minify JSON to match Bloom's preferred format.
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(outputs)))) as ex:
+        list(ex.map(_write_json, outputs,
+                    [_without_marker(p) for p in outputs.values()]))
+    for output_path in outputs:
         print(f"✅ Saved: {output_path}")
 
     print("👉 You can now import these files into Neo4j Bloom.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="Generate Neo4j Bloom perspectives from the database schema.")
+    parser.add_argument(
+        "--bundle", action="store_true",
+        help="write all perspectives to output/bundle.ndjson instead of one file each")
+    args = parser.parse_args()
+    main(bundle=args.bundle)
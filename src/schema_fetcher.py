@@ -1,7 +1,8 @@
 import os
-import json
+from collections import defaultdict
 from pathlib import Path
-from neo4j import GraphDatabase
+import orjson
+from neo4j import GraphDatabase, Result
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -9,18 +10,30 @@ load_dotenv()
 
 SCHEMA_CACHE_PATH = Path(__file__).parent / "schema.json"
 
-def fetch_schema(use_cache=True):
+# Exact label-to-label connections; scans every relationship in the database
+_EXACT_REL_QUERY = """
+MATCH (a)-[r]->(b)
+RETURN DISTINCT labels(a) AS start_node, type(r) AS rel_type, labels(b) AS end_node
+"""
+
+def fetch_schema(use_cache=True, exact_relationships=False):
     """
     Connects to the Neo4j database using credentials from environment variables
     and fetches the schema (labels, relationships, and properties).
     
-    If use_cache is True and schema.json exists, loads from file instead.
+    Relationships come from db.schema.visualization() by default, which can
+    list (start, type, end) label combinations that no relationship actually
+    has. Pass exact_relationships=True to scan the data graph
+    instead, as older versions did; this is slow on large databases.
+    
+    If use_cache is True and schema.json exists, loads from file instead. The
+    cache doesn't record which relationship query produced it, so combine
+    exact_relationships=True with use_cache=False to refresh it.
     """
     if use_cache and SCHEMA_CACHE_PATH.exists():
         print(f"   📂 Loading schema from cache: {SCHEMA_CACHE_PATH}")
         try:
-            with open(SCHEMA_CACHE_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return orjson.loads(SCHEMA_CACHE_PATH.read_bytes())
         except Exception as e:
             print(f"   ⚠️ Failed to load cache: {e}. Fetching live...")
 
@@ -43,71 +56,75 @@ def fetch_schema(use_cache=True):
         driver.verify_connectivity()
         print("   ✅ Connection established.")
 
-        with driver.session() as session:
-            # 1. Fetch Node Labels and Properties
-            # db.schema.nodeTypeProperties() returns nodeType, propertyName, propertyTypes, mandatory
-            print("   Fetching node properties...")
-            result_props = session.run("CALL db.schema.nodeTypeProperties()")
-            
-            for record in result_props:
-                node_type = record["nodeType"]
-                # nodeType is usually ":Label" or ":Label1:Label2"
-                # We'll simplisticly take the first label if multiple, removing the leading colon
-                labels = [l for l in node_type.split(":") if l]
-                
-                for label in labels:
-                    if label not in schema_data["labels"]:
-                        schema_data["labels"][label] = []
-                    
-                    prop_name = record["propertyName"]
-                    prop_type = record["propertyTypes"] # This is a list of types
-                    
-                    if prop_name:
-                        schema_data["labels"][label].append({
-                            "name": prop_name,
-                            "type": prop_type[0] if prop_type else "String" # Default to String
-                        })
+        # 1. Fetch Node Labels and Properties
+        # db.schema.nodeTypeProperties() returns nodeType, propertyName, propertyTypes, mandatory
+        print("   Fetching node properties...")
+        records_props, _, _ = driver.execute_query(
+            "CALL db.schema.nodeTypeProperties()")
+
+        # Property names already recorded per label; multi-label node types
+        # would otherwise add the same property once per combination
+        seen_props = defaultdict(set)
+
+        for record in records_props:
+            node_type = record["nodeType"]
+            # nodeType is usually ":Label" or ":Label1:Label2"
+            # We'll simplisticly take the first label if multiple, removing the leading colon
+            labels = [l for l in node_type.split(":") if l]
+
+            for label in labels:
+                if label not in schema_data["labels"]:
+                    schema_data["labels"][label] = []
 
-            # 2. Fetch Relationships
-            # db.schema.visualization() returns nodes and relationships in the schema
-            print("   Fetching relationships...")
-            result_viz = session.run("CALL db.schema.visualization()")
-            
-            # The result contains a single record with 'nodes' and 'relationships' lists
-            # But these are schema objects, not data nodes.
-            # Actually, db.schema.visualization returns graph objects.
-            # A better way for pure schema might be db.schema.relTypeProperties() or just parsing visualization.
-            
-            # Let's use a Cypher query to get distinct relationships with start/end labels
-            # This is more reliable for "What connects to what"
-            rel_query = """
-            MATCH (a)-[r]->(b)
-            RETURN DISTINCT labels(a) AS start_node, type(r) AS rel_type, labels(b) AS end_node
-            """
-            result_rels = session.run(rel_query)
-            
-            for record in result_rels:
-                start_labels = record["start_node"]
-                rel_type = record["rel_type"]
-                end_labels = record["end_node"]
-                
-                # Handle multiple labels by creating a connection for each combination or just the first one
-                # For simplicity, let's assume primary labels or take all combinations
-                for start in start_labels:
-                    for end in end_labels:
-                        # Avoid duplicates if possible, but list is fine
-                        rel_entry = {
+                prop_name = record["propertyName"]
+                prop_type = record["propertyTypes"] # This is a list of types
+
+                if prop_name and prop_name not in seen_props[label]:
+                    seen_props[label].add(prop_name)
+                    schema_data["labels"][label].append({
+                        "name": prop_name,
+                        "type": prop_type[0] if prop_type else "String" # Default to String
+                    })
+
+        # 2. Fetch Relationships as (start labels, type, end labels) rows
+        print("   Fetching relationships...")
+        if exact_relationships:
+            records_rels, _, _ = driver.execute_query(_EXACT_REL_QUERY)
+            rel_rows = [
+                (r["start_node"], r["rel_type"], r["end_node"]) for r in records_rels]
+        else:
+            # db.schema.visualization() returns a single record with the schema's
+            # label nodes and relationship types. It doesn't scan the data graph,
+            # so it stays cheap on large databases, but it is built from count-store
+            # statistics that only record (:L)-[:T]->() and ()-[:T]->(:L). A type
+            # seen from :A and into :B yields A-[T]->B even when no relationship
+            # joins those two labels, so the triples are an approximation.
+            record_viz = driver.execute_query(
+                "CALL db.schema.visualization()",
+                result_transformer_=Result.single)
+            rel_rows = [
+                (rel.start_node.labels, rel.type, rel.end_node.labels)
+                for rel in (record_viz["relationships"] if record_viz else [])]
+
+        # (start, type, end) tuples already added, for O(1) dedup
+        seen_rels = set()
+        for start_labels, rel_type, end_labels in rel_rows:
+            # Handle multiple labels by creating a connection for each combination
+            for start in start_labels:
+                for end in end_labels:
+                    rel_key = (start, rel_type, end)
+                    if rel_key not in seen_rels:
+                        seen_rels.add(rel_key)
+                        schema_data["relationships"].append({
                             "start": start,
                             "type": rel_type,
                             "end": end
-                        }
-                        if rel_entry not in schema_data["relationships"]:
-                            schema_data["relationships"].append(rel_entry)
-        
+                        })
+
         # Save to cache
         try:
-            with open(SCHEMA_CACHE_PATH, "w", encoding="utf-8") as f:
-                json.dump(schema_data, f, indent=2)
+            SCHEMA_CACHE_PATH.write_bytes(
+                orjson.dumps(schema_data, option=orjson.OPT_INDENT_2))
             print(f"   💾 Schema saved to cache: {SCHEMA_CACHE_PATH}")
         except Exception as e:
             print(f"   ⚠️ Failed to save cache: {e}")
@@ -128,6 +145,6 @@ if __name__ == "__main__":
         print("\n--- Schema Fetched Successfully ---")
         print(f"Labels found: {list(schema['labels'].keys())}")
         print(f"Relationships found: {len(schema['relationships'])}")
-        # print(json.dumps(schema, indent=2)) 
+        # print(orjson.dumps(schema, option=orjson.OPT_INDENT_2).decode()) 
     except Exception as e:
         print(f"Failed: {e}")
@@ -1,95 +1,366 @@
 import os
+import sys
 import json
+import mmap
+import logging
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from sys import intern
 from neo4j import GraphDatabase
+from neo4j.exceptions import DriverError, Neo4jError
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib encoder/decoder
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # Cache compression is optional
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables from .env file
 load_dotenv()
 
+# One cache file per query path, so the two output shapes never overwrite each
+# other. The visualization cache keeps the original schema_full.json name.
 SCHEMA_FULL_PATH = Path(__file__).parent / "schema_full.json"
+SCHEMA_FULL_FLAT_PATH = Path(__file__).parent / "schema_full.flat.json"
+
+# Naming the database up front skips the home-database lookup on session open
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+
+# Connection settings, read once at import time
+_URI = os.getenv("NEO4J_URI")
+_USER = os.getenv("NEO4J_USERNAME")
+_PWD = os.getenv("NEO4J_PASSWORD")
+_CREDS_OK = bool(_URI and _USER and _PWD)
+_MISSING_CREDS_MSG = "Missing Neo4j credentials in .env file"
+
+# Shared driver, created on first use so repeat calls reuse its connection pool
+_DRIVER = None
+_VERIFIED = False
+
+# Errors that mean "cache unusable, fetch live". Stdlib and orjson decode errors
+# and mmap's empty-file error are all ValueErrors.
+_CACHE_READ_ERRORS = (OSError, ValueError) + (
+    (zstandard.ZstdError,) if zstandard is not None else ())
+
+# Cache key recording which query path produced a schema. Caches written
+# before the key existed came from db.schema.visualization().
+_SOURCE_KEY = "source"
+_SOURCE_FLAT = "flat"
+_SOURCE_VISUALIZATION = "visualization"
+
+# Plain JSON cache file per source; a zstd-compressed copy (same name plus
+# .zst) is preferred when zstandard is installed
+_CACHE_PATHS = {
+    _SOURCE_FLAT: SCHEMA_FULL_FLAT_PATH,
+    _SOURCE_VISUALIZATION: SCHEMA_FULL_PATH
+}
 
-def fetch_schema_full(use_cache=True):
+# Schemas from the last cache load or live fetch, keyed by source, reused by
+# later use_cache=True calls
+_SCHEMA_CACHE = {}
+
+
+def _get_driver():
     """
-    Connects to Neo4j and fetches the full schema using db.schema.visualization()
-    Returns nodes and relationships with constraints and indexes metadata.
-    
-    If use_cache is True and schema_full.json exists, loads from file instead.
+    Returns the module-level Neo4j driver, creating it on first call.
+    Connectivity is verified once per process, not on every fetch.
     """
-    if use_cache and SCHEMA_FULL_PATH.exists():
-        print(f"   📂 Loading full schema from cache: {SCHEMA_FULL_PATH}")
-        try:
-            with open(SCHEMA_FULL_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"   ⚠️ Failed to load cache: {e}. Fetching live...")
+    global _DRIVER, _VERIFIED
+    if _DRIVER is None:
+        _DRIVER = GraphDatabase.driver(
+            _URI,
+            auth=(_USER, _PWD),
+            max_connection_pool_size=int(os.getenv("NEO4J_POOL", 50)),
+            connection_acquisition_timeout=60,
+            max_connection_lifetime=3600
+        )
+        atexit.register(_DRIVER.close)
+    if not _VERIFIED:
+        logger.info("   Connecting to %s...", _URI)
+        _DRIVER.verify_connectivity()
+        _VERIFIED = True
+        logger.info("   ✅ Connection established.")
+    return _DRIVER
 
-    uri = os.getenv("NEO4J_URI")
-    username = os.getenv("NEO4J_USERNAME")
-    password = os.getenv("NEO4J_PASSWORD")
 
-    if not all([uri, username, password]):
-        raise ValueError("Missing Neo4j credentials in .env file")
+def _shared_props(props, pool):
+    """
+    Returns the first dict seen in pool that is equal to props, so structurally
+    identical property dicts share one object while processing. Value types are
+    part of the key, so 1, 1.0 and True are never merged and the serialized JSON
+    is unchanged; only identity changes, so don't mutate the returned dicts in place.
+    """
+    try:
+        key = frozenset(
+            (k, type(v), tuple((type(x), x) for x in v) if isinstance(v, list) else v)
+            for k, v in props.items())
+    except TypeError:  # Unhashable values, keep the dict as is
+        return props
+    return pool.setdefault(key, props)
 
-    driver = GraphDatabase.driver(uri, auth=(username, password))
 
-    schema_data = {
-        "nodes": [],
-        "relationships": []
+def _node_data(node, props_pool):
+    """Converts a schema visualization node into a plain dict."""
+    # Read the driver's internal label/property storage directly; the public
+    # accessors (node.labels, dict(node)) build a copy per call.
+    # Labels come from a tiny vocabulary, so intern them.
+    return {
+        "identity": node.id,
+        "labels": [intern(l) for l in node._labels],
+        "properties": _shared_props(node._properties, props_pool),  # Node properties from visualization
+        "elementId": node.element_id
     }
 
+
+def _rel_data(rel, props_pool):
+    """Converts a schema visualization relationship into a plain dict."""
+    start_node = rel.start_node
+    end_node = rel.end_node
+    return {
+        "identity": rel.id,
+        "start": start_node.id,
+        "end": end_node.id,
+        "type": intern(rel.type),
+        "properties": _shared_props(rel._properties, props_pool),
+        "elementId": rel.element_id,
+        "startNodeElementId": start_node.element_id,
+        "endNodeElementId": end_node.element_id
+    }
+
+
+def _dumps(obj, indent=True):
+    """Encodes obj as JSON bytes (indented by default), using orjson when available."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if indent else None).encode("utf-8")
+
+
+def _zst_path(path):
+    """Returns the zstd-compressed sibling of a plain JSON cache path."""
+    return path.with_name(path.name + ".zst")
+
+
+def _cache_read_paths(source):
+    """
+    Returns the existing cache files for source, newest first. The .zst one is
+    only included when zstandard is installed, and wins ties with the plain one.
+    """
+    path = _CACHE_PATHS[source]
+    candidates = [_zst_path(path), path] if zstandard is not None else [path]
+    mtimes = {}
+    for candidate in candidates:
+        try:
+            mtimes[candidate] = candidate.stat().st_mtime
+        except OSError:  # Missing (or unreadable) cache file
+            pass
+    return sorted(mtimes, key=lambda candidate: -mtimes[candidate])
+
+
+def _cache_write_path(source):
+    """Returns the cache file new schemas from source are saved to."""
+    path = _CACHE_PATHS[source]
+    return _zst_path(path) if zstandard is not None else path
+
+
+def _read_cache(path):
+    """
+    Decodes a cache file. Compressed caches are decompressed in one shot; plain
+    JSON is parsed from a read-only memory map, which orjson reads through a
+    memoryview so the file is never copied into an intermediate bytes object.
+    """
+    if path.suffix == ".zst":
+        buf = zstandard.ZstdDecompressor().decompress(path.read_bytes())
+        return orjson.loads(buf) if orjson is not None else json.loads(buf)
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if orjson is None:
+                return json.loads(mm[:])
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def _write_cache(path, buf):
+    """
+    Writes buf to path atomically: one write to a sibling temp file, then a rename,
+    so an interrupted save never leaves a truncated cache behind.
+    """
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_bytes(buf)
+    os.replace(tmp_path, path)
+
+
+def _fetch_visualization(session):
+    """Fetches label nodes and relationship types via db.schema.visualization()."""
+    records = list(session.run("CALL db.schema.visualization()"))
+
+    # Process nodes and relationships, keyed by elementId so entries
+    # repeated across records are only kept once
+    seen_nodes = {}
+    seen_rels = {}
+    props_pool = {}
+    for record in records:
+        for node in record["nodes"]:
+            if node.element_id not in seen_nodes:
+                seen_nodes[node.element_id] = _node_data(node, props_pool)
+        for rel in record["relationships"]:
+            if rel.element_id not in seen_rels:
+                seen_rels[rel.element_id] = _rel_data(rel, props_pool)
+
+    return list(seen_nodes.values()), list(seen_rels.values())
+
+
+def _run_flat_query(driver, query, single_column):
+    """Runs query in its own session and returns its values (single_column) or dicts."""
+    with driver.session(database=NEO4J_DATABASE) as session:
+        # Consume the result in one call into plain values/dicts
+        result = session.run(query)
+        return result.value() if single_column else result.data()
+
+
+def _fetch_flat(driver):
+    """
+    Fetches the schema from flat procedure/SHOW records instead of the visualization
+    meta-graph. Nodes carry name/indexes/constraints properties, but constraints
+    lists constraint names where the visualization gives description strings.
+    Relationships only have a type: there are no meta-graph ids or endpoints.
+    The four lookups are independent, so each runs concurrently in its own
+    session, drawing connections from the shared driver's pool.
+    """
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        labels = ex.submit(
+            _run_flat_query, driver, "CALL db.labels() YIELD label", True)
+        rel_types = ex.submit(
+            _run_flat_query, driver,
+            "CALL db.relationshipTypes() YIELD relationshipType", True)
+        indexes = ex.submit(
+            _run_flat_query, driver,
+            "SHOW INDEXES YIELD entityType, labelsOrTypes, properties, owningConstraint", False)
+        constraints = ex.submit(
+            _run_flat_query, driver,
+            "SHOW CONSTRAINTS YIELD name, entityType, labelsOrTypes", False)
+
+        labels = labels.result()
+        rel_types = rel_types.result()
+        indexes = indexes.result()
+        constraints = constraints.result()
+
+    node_props = {
+        label: {"name": label, "indexes": [], "constraints": []} for label in labels}
+
+    # Like the visualization, list indexes by property and skip the ones that
+    # back a constraint (and token lookup indexes, which have no label)
+    for index in indexes:
+        if index["entityType"] != "NODE" or index["owningConstraint"]:
+            continue
+        for label in index["labelsOrTypes"] or []:
+            if label in node_props:
+                node_props[label]["indexes"].append(",".join(index["properties"]))
+
+    for constraint in constraints:
+        if constraint["entityType"] != "NODE":
+            continue
+        for label in constraint["labelsOrTypes"] or []:
+            if label in node_props:
+                node_props[label]["constraints"].append(constraint["name"])
+
+    nodes = [
+        {"labels": [intern(label)], "properties": props} for label, props in node_props.items()]
+    relationships = [{"type": intern(t), "properties": {"name": t}} for t in rel_types]
+    return nodes, relationships
+
+
+def fetch_schema_full(use_cache=True, use_visualization=False):
+    """
+    Connects to Neo4j and fetches the full schema: label nodes and relationship
+    types with constraints and indexes metadata. By default this uses flat
+    db.labels()/db.relationshipTypes()/SHOW queries; pass use_visualization=True
+    for the previous db.schema.visualization() output (with ids and endpoints).
+    
+    If use_cache is True and a cache file exists, loads from file instead. Each
+    query path has its own cache (schema_full.flat.json for the default,
+    schema_full.json for the visualization), stored with a .zst suffix when
+    zstandard is installed. Within one process the decoded schema is kept in
+    memory for repeat calls. Schemas record which query path produced them;
+    a cache from the other path is treated as a miss.
+
+    The returned schema is shared with later calls (and equal property dicts
+    inside it may be one object), so treat it as read-only; copy it before
+    making changes.
+    """
+    source = _SOURCE_VISUALIZATION if use_visualization else _SOURCE_FLAT
+    if use_cache and source in _SCHEMA_CACHE:
+        return _SCHEMA_CACHE[source]
+
+    # Try each cache file in turn; an unreadable one or one from the other
+    # source falls through to the next, then to a live fetch
+    for cache_path in (_cache_read_paths(source) if use_cache else []):
+        logger.info("   📂 Loading full schema from cache: %s", cache_path)
+        try:
+            cached = _read_cache(cache_path)
+        except _CACHE_READ_ERRORS as e:
+            logger.warning("   ⚠️ Failed to load cache: %s", e)
+            continue
+        cached_source = (cached.get(_SOURCE_KEY, _SOURCE_VISUALIZATION)
+                         if isinstance(cached, dict) else None)
+        if cached_source == source:
+            _SCHEMA_CACHE[source] = cached
+            return cached
+        logger.info("   Cache holds a %s schema, not %s.", cached_source, source)
+
+    if not _CREDS_OK:
+        raise ValueError(_MISSING_CREDS_MSG)
+
     try:
-        print(f"   Connecting to {uri}...")
-        driver.verify_connectivity()
-        print("   ✅ Connection established.")
+        driver = _get_driver()
 
-        with driver.session() as session:
+        if use_visualization:
             # Fetch schema visualization
-            print("   Fetching schema visualization...")
-            result = session.run("CALL db.schema.visualization()")
-            
-            for record in result:
-                # Process nodes
-                for node in record["nodes"]:
-                    node_data = {
-                        "identity": node.id,
-                        "labels": list(node.labels),
-                        "properties": dict(node),  # Node properties from visualization
-                        "elementId": node.element_id
-                    }
-                    schema_data["nodes"].append(node_data)
-                
-                # Process relationships
-                for rel in record["relationships"]:
-                    rel_data = {
-                        "identity": rel.id,
-                        "start": rel.start_node.id,
-                        "end": rel.end_node.id,
-                        "type": rel.type,
-                        "properties": dict(rel),
-                        "elementId": rel.element_id,
-                        "startNodeElementId": rel.start_node.element_id,
-                        "endNodeElementId": rel.end_node.element_id
-                    }
-                    schema_data["relationships"].append(rel_data)
-        
+            logger.info("   Fetching schema visualization...")
+            with driver.session(database=NEO4J_DATABASE) as session:
+                nodes, relationships = _fetch_visualization(session)
+        else:
+            logger.info("   Fetching labels, relationship types, indexes and constraints...")
+            nodes, relationships = _fetch_flat(driver)
+
+        schema_data = {
+            _SOURCE_KEY: source,
+            "nodes": nodes,
+            "relationships": relationships
+        }
+
         # Save to cache
         try:
-            with open(SCHEMA_FULL_PATH, "w", encoding="utf-8") as f:
-                json.dump(schema_data, f, indent=2)
-            print(f"   💾 Full schema saved to cache: {SCHEMA_FULL_PATH}")
-        except Exception as e:
-            print(f"   ⚠️ Failed to save cache: {e}")
+            cache_path = _cache_write_path(source)
+            if cache_path.suffix == ".zst":
+                # Compact JSON compresses smaller; level 3 is zstd's fast default
+                buf = zstandard.ZstdCompressor(level=3).compress(
+                    _dumps(schema_data, indent=False))
+            else:
+                buf = _dumps(schema_data)
+            _write_cache(cache_path, buf)
+            logger.info("   💾 Full schema saved to cache: %s", cache_path)
+        except (OSError, TypeError) as e:  # TypeError: value JSON can't encode
+            logger.warning("   ⚠️ Failed to save cache: %s", e)
 
-    except Exception as e:
-        print(f"❌ Error fetching schema: {e}")
-        raise e
-    finally:
-        driver.close()
+    except (Neo4jError, DriverError, OSError) as e:
+        logger.error("❌ Error fetching schema: %s", e)
+        raise
 
+    _SCHEMA_CACHE[source] = schema_data
     return schema_data
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("🔍 Fetching full Neo4j schema...")
     
     try:
@@ -99,25 +370,26 @@ if __name__ == "__main__":
         print(f"   Nodes: {len(schema['nodes'])}")
         print(f"   Relationships: {len(schema['relationships'])}")
         
-        # Display nodes
-        print("\n📋 Nodes:")
+        # Display nodes and relationships, collected and written in one call
+        lines = ["", "📋 Nodes:"]
         for node in schema['nodes']:
-            labels = ', '.join(node['labels'])
-            name = node['properties'].get('name', labels)
-            indexes = node['properties'].get('indexes', [])
-            constraints = node['properties'].get('constraints', [])
-            print(f"   - {name}")
+            props = node['properties']
+            labels = node['labels']
+            name = props.get('name') or (labels[0] if labels else '?')
+            indexes = props.get('indexes')
+            constraints = props.get('constraints')
+            lines.append(f"   - {name}")
             if indexes:
-                print(f"      Indexes: {', '.join(indexes)}")
+                lines.append(f"      Indexes: {', '.join(indexes)}")
             if constraints:
-                print(f"      Constraints: {len(constraints)}")
-        
-        # Display relationships
-        print("\n🔗 Relationships:")
-        for rel in schema['relationships']:
-            print(f"   - {rel['type']}")
+                lines.append(f"      Constraints: {len(constraints)}")
+
+        lines.append("")
+        lines.append("🔗 Relationships:")
+        lines.extend(f"   - {rel['type']}" for rel in schema['relationships'])
+        sys.stdout.write("\n".join(lines) + "\n")
         
-        print(f"\n💾 Schema cached in: {SCHEMA_FULL_PATH}")
+        print(f"\n💾 Schema cached in: {_cache_write_path(_SOURCE_FLAT)}")
         
     except Exception as e:
         print(f"❌ Error: {e}")